@@ -7,6 +7,14 @@ from domain.aggregated_data import AggregatedData
 import config
 
 
+def read_rows(filename: str, *types) -> list:
+    """Читає CSV файл без заголовка у список кортежів заданих типів"""
+    with open(filename, 'r', newline='') as file:
+        rows = reader(file)
+        next(rows)
+        return [tuple(cast(value) for cast, value in zip(types, row)) for row in rows if row]
+
+
 class FileDatasource:
     def __init__(
         self,
@@ -18,45 +26,48 @@ class FileDatasource:
         self.gps_filename = gps_filename;
         self.parking_filename = parking_filename;
 
-        self.accelerometer_file = None;
-        self.gps_file = None;
-        self.parking_file = None;
+        self.data = None;
+
+        self.index = 0;
+        self.length = 0;
 
     def read(self) -> AggregatedData:
         """Метод повертає дані отримані з датчиків"""
-        accelerometer_data = self.accelerometer_file.readline().strip().split(',')
-        gps_data = self.gps_file.readline().strip().split(',')
-        parking_data = self.parking_file.readline().strip().split(',')
+        if self.index >= self.length:
+            return None
 
-        if accelerometer_data and gps_data and parking_data:
-          empty_count = int(parking_data[0])
-          parking_gps = Gps(*map(float, parking_data[1:]))
+        x, y, z, longitude, latitude, empty_count, parking_longitude, parking_latitude = self.data[self.index]
+        self.index += 1
 
-          parking = Parking(empty_count, parking_gps)
+        parking_gps = Gps(parking_longitude, parking_latitude)
 
-          return AggregatedData(
-              Accelerometer(*map(int, accelerometer_data)),
-              Gps(*map(float, gps_data)),
-              parking,
-              datetime.now(),
-              config.USER_ID,
-          )
+        parking = Parking(empty_count, parking_gps)
+
+        return AggregatedData(
+            Accelerometer(x, y, z),
+            Gps(longitude, latitude),
+            parking,
+            datetime.now(),
+            config.USER_ID,
+        )
 
     def startReading(self, *args, **kwargs):
         """Метод повинен викликатись перед початком читання даних"""
-        self.accelerometer_file = open(self.accelerometer_filename, 'r');
-        self.gps_file = open(self.gps_filename, 'r');
-        self.parking_file = open(self.parking_filename, 'r');
+        accelerometer_data = read_rows(self.accelerometer_filename, int, int, int);
+        gps_data = read_rows(self.gps_filename, float, float);
+        parking_data = read_rows(self.parking_filename, int, float, float);
+
+        # One flat tuple per tick, so read() only unpacks native ints and floats
+        self.data = [
+            accelerometer + gps + parking
+            for accelerometer, gps, parking in zip(accelerometer_data, gps_data, parking_data)
+        ];
+        self.length = len(self.data);
 
-        next(self.accelerometer_file);
-        next(self.gps_file);
-        next(self.parking_file);
+        self.index = 0;
 
     def stopReading(self, *args, **kwargs):
         """Метод повинен викликатись для закінчення читання даних"""
-        if self.accelerometer_file:
-            self.accelerometer_file.close()
-        if self.gps_file:
-            self.gps_file.close()
-        if self.parking_file:
-            self.parking_file.close()
+        self.data = None
+        self.index = 0
+        self.length = 0
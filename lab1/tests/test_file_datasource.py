@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from file_datasource import FileDatasource
+
+DATA_DIR = os.path.join(SRC_DIR, "data")
+
+
+class TestFileDatasource(unittest.TestCase):
+    def setUp(self):
+        # Create the FileDatasource over the bundled CSV files
+        self.datasource = FileDatasource(
+            os.path.join(DATA_DIR, "accelerometer.csv"),
+            os.path.join(DATA_DIR, "gps.csv"),
+            os.path.join(DATA_DIR, "parking.csv"),
+        )
+        self.datasource.startReading()
+
+    def tearDown(self):
+        self.datasource.stopReading()
+
+    def test_read_first_row(self):
+        # Test that the first row of every file is parsed with its types
+        data = self.datasource.read()
+        self.assertEqual((data.accelerometer.x, data.accelerometer.y, data.accelerometer.z), (-17, 4, 16516))
+        self.assertIsInstance(data.accelerometer.x, int)
+        self.assertEqual(data.gps.longitude, 50.450386085935094)
+        self.assertEqual(data.gps.latitude, 30.524547100067142)
+        self.assertEqual(data.parking.empty_count, 1)
+        self.assertEqual(data.parking.gps.longitude, 50.450386085935094)
+        self.assertEqual(data.parking.gps.latitude, 30.524547100067142)
+
+    def test_read_returns_none_at_end_of_data(self):
+        # Test that reading stops at the shortest file and then returns None
+        count = 0
+        while self.datasource.read() is not None:
+            count += 1
+        self.assertEqual(count, 125)
+        self.assertIsNone(self.datasource.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,11 @@
 import os
 
 
-def try_parse(type, value: str):
+def try_parse(type, value: str, default=None):
     try:
         return type(value)
     except Exception:
-        return None
+        return default
 
 
 # Configuration for POSTGRES
@@ -14,3 +14,17 @@ POSTGRES_PORT = try_parse(int, os.environ.get("POSTGRES_PORT")) or 5432
 POSTGRES_USER = os.environ.get("POSTGRES_USER") or "user"
 POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASS") or "pass"
 POSTGRES_DB = os.environ.get("POSTGRES_DB") or "test_db"
+# Connections the whole store may open, split evenly between gunicorn workers
+# (gunicorn_conf.py exports the worker count as WEB_CONCURRENCY)
+POSTGRES_MAX_CONNECTIONS = try_parse(int, os.environ.get("POSTGRES_MAX_CONNECTIONS"), 80)
+WEB_CONCURRENCY = max(1, try_parse(int, os.environ.get("WEB_CONCURRENCY"), 1))
+# gunicorn_conf.py caps the workers so every worker gets at least one
+WORKER_CONNECTIONS = max(1, POSTGRES_MAX_CONNECTIONS // WEB_CONCURRENCY)
+POSTGRES_POOL_SIZE = try_parse(int, os.environ.get("POSTGRES_POOL_SIZE"), max(1, WORKER_CONNECTIONS // 2))
+POSTGRES_MAX_OVERFLOW = try_parse(
+    int, os.environ.get("POSTGRES_MAX_OVERFLOW"), max(0, WORKER_CONNECTIONS - POSTGRES_POOL_SIZE)
+)
+
+# Configuration for Redis
+REDIS_HOST = os.environ.get("REDIS_HOST") or "localhost"
+REDIS_PORT = try_parse(int, os.environ.get("REDIS_PORT")) or 6379
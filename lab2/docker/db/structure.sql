@@ -8,4 +8,7 @@ CREATE TABLE processed_agent_data (
     latitude FLOAT,
     longitude FLOAT,
     timestamp TIMESTAMP
-);
\ No newline at end of file
+);
+
+CREATE INDEX ix_processed_agent_data_user_id_timestamp
+    ON processed_agent_data (user_id, timestamp DESC);
\ No newline at end of file
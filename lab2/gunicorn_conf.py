@@ -0,0 +1,30 @@
+import os
+
+# Gunicorn config for running the store on all cores:
+#   gunicorn -c gunicorn_conf.py main:app
+#
+# NOTE: WebSocket subscriptions in main.py are kept per worker process;
+# data for subscribers is fanned out across workers through Redis pub/sub.
+bind = os.environ.get("BIND") or "0.0.0.0:8000"
+workers = int(os.environ.get("WEB_CONCURRENCY") or 2 * (os.cpu_count() or 1) + 1)
+# Same budget as POSTGRES_MAX_CONNECTIONS in config.py; each worker needs at
+# least one connection of it
+max_workers = max(1, int(os.environ.get("POSTGRES_MAX_CONNECTIONS") or 80))
+requested_workers = workers
+workers = min(workers, max_workers)
+# Workers inherit this, so config.py can split the connection budget
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def on_starting(server):
+    if requested_workers > workers:
+        server.log.warning(
+            f"Running {workers} workers instead of {requested_workers} to stay "
+            f"within POSTGRES_MAX_CONNECTIONS={max_workers}"
+        )
+    # Create the schema once in the master, before any worker is forked
+    import asyncio
+    from main import create_tables
+
+    asyncio.run(create_tables())
@@ -1,9 +1,10 @@
 import asyncio
-import json
-from typing import Set, Dict, List, Any, ClassVar
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Body, Depends
+import logging
+import orjson
+from typing import Set, Dict, List, Any, ClassVar, Optional
+from fastapi import FastAPI, HTTPException, WebSocket, Body, Depends, Query
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy import (
-    create_engine,
     MetaData,
     Table,
     Column,
@@ -11,25 +12,43 @@ from sqlalchemy import (
     String,
     Float,
     DateTime,
+    Index,
 )
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.sql import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.sql import select, bindparam
 from datetime import datetime
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel
+from redis.asyncio import Redis
 from config import (
     POSTGRES_HOST,
     POSTGRES_PORT,
     POSTGRES_DB,
     POSTGRES_USER,
     POSTGRES_PASSWORD,
+    POSTGRES_POOL_SIZE,
+    POSTGRES_MAX_OVERFLOW,
+    REDIS_HOST,
+    REDIS_PORT,
 )
 
 # FastAPI app setup
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 # SQLAlchemy setup
-DATABASE_URL = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+# The pool is per worker process: total connections opened against Postgres
+# are up to workers * (pool_size + max_overflow). The defaults in config.py
+# split POSTGRES_MAX_CONNECTIONS between workers to stay below the server's
+# max_connections.
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=POSTGRES_POOL_SIZE,
+    max_overflow=POSTGRES_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    # asyncpg prepares every statement; keep the prepared ones per connection
+    # so repeated CRUD queries skip server-side parse and plan
+    connect_args={"prepared_statement_cache_size": 500},
+)
 metadata = MetaData()
 # Define the ProcessedAgentData table
 processed_agent_data = Table(
@@ -45,9 +64,34 @@ processed_agent_data = Table(
     Column("longitude", Float),
     Column("timestamp", DateTime),
 )
-SessionLocal = sessionmaker(bind=engine)
+# Serves "latest N records of a user" lookups without a sequential scan
+Index(
+    "ix_processed_agent_data_user_id_timestamp",
+    processed_agent_data.c.user_id,
+    processed_agent_data.c.timestamp.desc(),
+)
 
-Base = declarative_base()
+# CRUD statements built once; each call only binds parameters, so the
+# compiled SQL is reused from the cache
+insert_processed_agent_data = processed_agent_data.insert().returning(
+    processed_agent_data.c.id,
+    processed_agent_data.c.timestamp,
+)
+select_processed_agent_data_by_id = select(processed_agent_data).where(
+    processed_agent_data.c.id == bindparam("processed_agent_data_id")
+)
+update_processed_agent_data_by_id = (
+    processed_agent_data.update()
+    .where(processed_agent_data.c.id == bindparam("processed_agent_data_id"))
+    .returning(*processed_agent_data.c)
+)
+delete_processed_agent_data_by_id = (
+    processed_agent_data.delete()
+    .where(processed_agent_data.c.id == bindparam("processed_agent_data_id"))
+    .returning(*processed_agent_data.c)
+)
+
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 # SQLAlchemy model
 class ProcessedAgentDataCreate(BaseModel):
@@ -81,127 +125,259 @@ class AgentData(BaseModel):
     gps: GpsData
     timestamp: datetime
 
-    @classmethod
-    @field_validator("timestamp", mode="before")
-    def check_timestamp(cls, value):
-        if isinstance(value, datetime):
-            return value
-        try:
-            return datetime.fromisoformat(value)
-        except (TypeError, ValueError):
-            raise ValueError(
-                "Invalid timestamp format. Expected ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ)."
-            )
 
+# Run once before serving (gunicorn on_starting hook or __main__), not per
+# worker: concurrent CREATE TABLE from several workers collide in Postgres
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+    # Drop connections bound to this event loop before workers take over
+    await engine.dispose()
+
+
+# Redis pub/sub delivers data to subscribers connected to any worker
+redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+
+# WebSocket subscriptions of this worker, each with its outgoing queue
+subscriptions: Dict[int, Dict[WebSocket, asyncio.Queue]] = {}
+
+# Messages a subscriber may fall behind before it is dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Redis listener of this worker, started with the app
+redis_listener: Optional[asyncio.Task] = None
+
+USER_CHANNEL_PATTERN = "user:*"
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def unsubscribe(user_id: int, websocket: WebSocket):
+    queues = subscriptions.get(user_id)
+    if queues is not None:
+        queues.pop(websocket, None)
+        if not queues:
+            del subscriptions[user_id]
 
-class ProcessedAgentData(Base):
-    __tablename__ = "processed_agent_data"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    road_state = Column(String)
-    user_id = Column(Integer)
-    x = Column(Float)
-    y = Column(Float)
-    z = Column(Float)
-    latitude = Column(Float)
-    longitude = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+def fan_out(user_id: int, payload: str):
+    # Only enqueues: a slow socket never holds up the listener or other users
+    for websocket, queue in list(subscriptions.get(user_id, {}).items()):
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logging.warning(f"Dropping slow subscriber of user {user_id}")
+            unsubscribe(user_id, websocket)
+            # Replace the backlog with the stop marker for its sender
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+
+async def listen_for_messages():
+    # One pattern subscription per worker, fanned out to its local sockets
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.psubscribe(USER_CHANNEL_PATTERN)
+            async for message in pubsub.listen():
+                if message["type"] == "pmessage":
+                    user_id = int(message["channel"].split(":", 1)[1])
+                    fan_out(user_id, message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Redis subscription failed, reconnecting")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
+
+
+@app.on_event("startup")
+async def start_redis_listener():
+    global redis_listener
+    redis_listener = asyncio.create_task(listen_for_messages())
+
+
+@app.on_event("shutdown")
+async def stop_redis_listener():
+    if redis_listener is not None:
+        redis_listener.cancel()
+        try:
+            await redis_listener
+        except asyncio.CancelledError:
+            pass
 
-Base.metadata.create_all(bind=engine)
 
-# WebSocket subscriptions
-subscriptions: Dict[int, Set[WebSocket]] = {}
+async def send_messages(user_id: int, websocket: WebSocket, queue: asyncio.Queue):
+    try:
+        while (payload := await queue.get()) is not None:
+            await websocket.send_text(payload)
+        # Dropped as too slow; close so the client can reconnect
+        await websocket.close()
+    except Exception as e:
+        logging.warning(f"Subscriber of user {user_id} failed: {e!r}")
+    finally:
+        unsubscribe(user_id, websocket)
 
 
 # FastAPI WebSocket endpoint
 @app.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: int):
     await websocket.accept()
-    if user_id not in subscriptions:
-        subscriptions[user_id] = set()
-    subscriptions[user_id].add(websocket)
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    sender = None
     try:
-        while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        subscriptions[user_id].remove(websocket)
+        if user_id not in subscriptions:
+            subscriptions[user_id] = {}
+        subscriptions[user_id][websocket] = queue
+        sender = asyncio.create_task(send_messages(user_id, websocket, queue))
+        # Client frames are ignored; take raw messages without decoding them
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        unsubscribe(user_id, websocket)
+        if sender is not None:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
 
 
 # Function to send data to subscribed users
 async def send_data_to_subscribers(user_id: int, data):
-    if user_id in subscriptions:
-        for websocket in subscriptions[user_id]:
-            await websocket.send_json(json.dumps(data))
+    # Serialized once per publish; workers send the text frame as is
+    payload = orjson.dumps(data).decode()
+    await redis_client.publish(user_channel(user_id), payload)
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # FastAPI CRUDL endpoints
 
-@app.post("/processed_agent_data/")
+# Batches larger than this are streamed with COPY instead of executemany
+COPY_THRESHOLD = 500
+
+PROCESSED_AGENT_DATA_COLUMNS = (
+    "road_state",
+    "user_id",
+    "x",
+    "y",
+    "z",
+    "latitude",
+    "longitude",
+    "timestamp",
+)
+
+
+def _to_rows(items: List[ProcessedAgentDataCreate]):
+    timestamp = datetime.utcnow()
+    return [item.model_dump() | {"timestamp": timestamp} for item in items]
+
+
+async def _copy_rows(conn, rows):
+    """
+    COPY rows over the asyncpg connection behind the session.
+    SQLAlchemy's asyncpg adapter only begins its transaction on the first
+    statement it executes, so the COPY runs in its own driver transaction
+    and commits on its own, independently of the session.
+    """
+    raw_connection = await conn.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    async with driver_connection.transaction():
+        await driver_connection.copy_records_to_table(
+            "processed_agent_data",
+            records=[
+                tuple(row[column] for column in PROCESSED_AGENT_DATA_COLUMNS)
+                for row in rows
+            ],
+            columns=PROCESSED_AGENT_DATA_COLUMNS,
+        )
+
+
+@app.post("/processed_agent_data/", response_model=ProcessedAgentDataInDB)
 async def create_processed_agent_data(
     data: ProcessedAgentDataCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_item = ProcessedAgentData(
-        road_state=data.road_state,
-        user_id=data.user_id,
-        x=data.x,
-        y=data.y,
-        z=data.z,
-        latitude=data.latitude,
-        longitude=data.longitude,
-    )
-    db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
-    return db_item
+    values = data.model_dump()
+    # id and timestamp come back from the INSERT itself, no extra SELECT
+    created = (await db.execute(
+        insert_processed_agent_data,
+        values | {"timestamp": datetime.utcnow()},
+    )).mappings().one()
+    await db.commit()
+    return values | dict(created)
+
+
+@app.post("/processed_agent_data/batch/")
+async def create_processed_agent_data_bulk(
+    items: List[ProcessedAgentDataCreate],
+    db: AsyncSession = Depends(get_db)
+):
+    if len(items) > COPY_THRESHOLD:
+        await _copy_rows(await db.connection(), _to_rows(items))
+    elif items:
+        # One executemany and a single commit for the whole batch
+        await db.execute(processed_agent_data.insert(), _to_rows(items))
+        await db.commit()
+    return {"inserted": len(items)}
 
 
 @app.get(
     "/processed_agent_data/{processed_agent_data_id}",
     response_model=ProcessedAgentDataInDB,
 )
-def read_processed_agent_data(
+async def read_processed_agent_data(
     processed_agent_data_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_item = db.query(ProcessedAgentData).filter(ProcessedAgentData.id == processed_agent_data_id).first()
+    db_item = (await db.execute(
+        select_processed_agent_data_by_id,
+        {"processed_agent_data_id": processed_agent_data_id},
+    )).mappings().first()
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
     return db_item
 
 
-@app.get("/processed_agent_data/", response_model=list[ProcessedAgentDataInDB])
-def list_processed_agent_data(db: Session = Depends(get_db)):
-    return db.query(ProcessedAgentData).all()
+# Largest page the list endpoint returns
+MAX_LIST_LIMIT = 5000
+
+
+@app.get("/processed_agent_data/")
+async def list_processed_agent_data(
+    limit: int = Query(1000, ge=1, le=MAX_LIST_LIMIT),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    rows = (await db.execute(
+        select(processed_agent_data)
+        .order_by(processed_agent_data.c.id)
+        .limit(limit)
+        .offset(offset)
+    )).mappings()
+    body = b"".join(orjson.dumps(dict(row)) + b"\n" for row in rows)
+    return Response(content=body, media_type="application/x-ndjson")
 
 
 @app.put(
     "/processed_agent_data/{processed_agent_data_id}",
     response_model=ProcessedAgentDataInDB,
 )
-def update_processed_agent_data(
+async def update_processed_agent_data(
     processed_agent_data_id: int,
     data: ProcessedAgentDataCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_item = db.query(ProcessedAgentData).filter(ProcessedAgentData.id == processed_agent_data_id).first()
+    db_item = (await db.execute(
+        update_processed_agent_data_by_id,
+        data.model_dump() | {"processed_agent_data_id": processed_agent_data_id},
+    )).mappings().first()
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    db_item.road_state = data.road_state
-    db_item.user_id = data.user_id
-    db_item.x = data.x
-    db_item.y = data.y
-    db_item.z = data.z
-    db_item.latitude = data.latitude
-    db_item.longitude = data.longitude
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
     return db_item
 
 
@@ -209,19 +385,31 @@ def update_processed_agent_data(
     "/processed_agent_data/{processed_agent_data_id}",
     response_model=ProcessedAgentDataInDB,
 )
-def delete_processed_agent_data(
+async def delete_processed_agent_data(
     processed_agent_data_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_item = db.query(ProcessedAgentData).filter(ProcessedAgentData.id == processed_agent_data_id).first()
+    db_item = (await db.execute(
+        delete_processed_agent_data_by_id,
+        {"processed_agent_data_id": processed_agent_data_id},
+    )).mappings().first()
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    db.delete(db_item)
-    db.commit()
+    await db.commit()
     return db_item
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    asyncio.run(create_tables())
+    uvicorn.run(
+        app,
+        host="127.0.0.1",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=1,
+        ws_ping_interval=20,
+        ws_ping_timeout=20,
+    )
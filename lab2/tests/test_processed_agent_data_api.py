@@ -0,0 +1,110 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+
+import main
+
+
+def make_item(user_id=1):
+    return {
+        "road_state": "normal",
+        "user_id": user_id,
+        "x": 0.1,
+        "y": 0.2,
+        "z": 0.3,
+        "latitude": 10.123,
+        "longitude": 20.456,
+    }
+
+
+class TestProcessedAgentDataApi(unittest.TestCase):
+    def setUp(self):
+        # Stub the session, and the asyncpg connection behind it, for every request
+        self.events = []
+        self.driver_connection = MagicMock()
+        self.driver_connection.transaction.return_value = self.make_transaction()
+        self.driver_connection.copy_records_to_table = AsyncMock(
+            side_effect=lambda *args, **kwargs: self.events.append("copy")
+        )
+        raw_connection = MagicMock(driver_connection=self.driver_connection)
+        connection = MagicMock()
+        connection.get_raw_connection = AsyncMock(return_value=raw_connection)
+        self.db = MagicMock()
+        self.db.execute = AsyncMock()
+        self.db.commit = AsyncMock()
+        self.db.connection = AsyncMock(return_value=connection)
+
+        async def get_db():
+            yield self.db
+
+        main.app.dependency_overrides[main.get_db] = get_db
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        main.app.dependency_overrides.clear()
+
+    def make_transaction(self):
+        transaction = MagicMock()
+        transaction.__aenter__ = AsyncMock(
+            side_effect=lambda *args: self.events.append("begin")
+        )
+        transaction.__aexit__ = AsyncMock(
+            side_effect=lambda *args: self.events.append("commit")
+        )
+        return transaction
+
+    def test_bulk_small_batch_uses_executemany(self):
+        # Test that batches up to COPY_THRESHOLD rows are one executemany and one commit
+        items = [make_item() for _ in range(main.COPY_THRESHOLD)]
+        response = self.client.post("/processed_agent_data/batch/", json=items)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"inserted": main.COPY_THRESHOLD})
+        self.db.execute.assert_awaited_once()
+        statement, rows = self.db.execute.await_args.args
+        self.assertEqual(statement.table, main.processed_agent_data)
+        self.assertEqual(len(rows), main.COPY_THRESHOLD)
+        self.db.commit.assert_awaited_once()
+        self.driver_connection.copy_records_to_table.assert_not_awaited()
+
+    def test_bulk_large_batch_uses_copy_in_transaction(self):
+        # Test that batches over COPY_THRESHOLD rows are copied inside a driver transaction
+        items = [make_item() for _ in range(main.COPY_THRESHOLD + 1)]
+        response = self.client.post("/processed_agent_data/batch/", json=items)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"inserted": main.COPY_THRESHOLD + 1})
+        self.assertEqual(self.events, ["begin", "copy", "commit"])
+        args, kwargs = self.driver_connection.copy_records_to_table.await_args
+        self.assertEqual(args, ("processed_agent_data",))
+        self.assertEqual(len(kwargs["records"]), main.COPY_THRESHOLD + 1)
+        self.assertEqual(kwargs["columns"], main.PROCESSED_AGENT_DATA_COLUMNS)
+        self.db.execute.assert_not_awaited()
+
+    def test_bulk_empty_batch(self):
+        # Test that an empty batch touches nothing
+        response = self.client.post("/processed_agent_data/batch/", json=[])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"inserted": 0})
+        self.db.execute.assert_not_awaited()
+        self.db.commit.assert_not_awaited()
+
+    def test_list_rejects_out_of_range_limit(self):
+        # Test that limit outside 1..MAX_LIST_LIMIT is a validation error
+        for limit in (0, main.MAX_LIST_LIMIT + 1):
+            response = self.client.get(f"/processed_agent_data/?limit={limit}")
+            self.assertEqual(response.status_code, 422)
+        self.db.execute.assert_not_awaited()
+
+    def test_list_returns_ndjson(self):
+        # Test that the list page is returned as one JSON object per line
+        rows = [{"id": 1} | make_item(), {"id": 2} | make_item(user_id=2)]
+        self.db.execute.return_value = MagicMock(mappings=MagicMock(return_value=rows))
+        response = self.client.get("/processed_agent_data/?limit=2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = response.content.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(b'"user_id":2', lines[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
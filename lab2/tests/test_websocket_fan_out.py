@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+import main
+
+
+class TestWebsocketFanOut(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        main.subscriptions.clear()
+
+    def tearDown(self):
+        main.subscriptions.clear()
+
+    def subscribe(self, user_id, websocket, maxsize=main.SUBSCRIBER_QUEUE_SIZE):
+        queue = asyncio.Queue(maxsize=maxsize)
+        main.subscriptions.setdefault(user_id, {})[websocket] = queue
+        return queue
+
+    async def test_slow_subscriber_does_not_block_other_users(self):
+        # Test that a send that never returns only stalls its own socket
+        stuck = MagicMock()
+        stuck.send_text = AsyncMock(side_effect=lambda payload: asyncio.Event().wait())
+        healthy = MagicMock()
+        healthy.send_text = AsyncMock()
+        senders = [
+            asyncio.create_task(main.send_messages(1, stuck, self.subscribe(1, stuck))),
+            asyncio.create_task(main.send_messages(2, healthy, self.subscribe(2, healthy))),
+        ]
+        main.fan_out(1, "to user 1")
+        main.fan_out(2, "to user 2")
+        await asyncio.sleep(0.1)
+        healthy.send_text.assert_awaited_once_with("to user 2")
+        for sender in senders:
+            sender.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+
+    async def test_full_queue_drops_subscriber(self):
+        # Test that a subscriber whose queue is full is removed and its socket closed
+        websocket = MagicMock()
+        websocket.send_text = AsyncMock()
+        websocket.close = AsyncMock()
+        queue = self.subscribe(1, websocket, maxsize=1)
+        main.fan_out(1, "first")
+        main.fan_out(1, "second")
+        self.assertNotIn(1, main.subscriptions)
+        await main.send_messages(1, websocket, queue)
+        websocket.send_text.assert_not_awaited()
+        websocket.close.assert_awaited_once()
+
+    async def test_failed_send_unsubscribes(self):
+        # Test that a socket whose send fails is removed from the subscriptions
+        websocket = MagicMock()
+        websocket.send_text = AsyncMock(side_effect=RuntimeError("closed"))
+        queue = self.subscribe(1, websocket)
+        main.fan_out(1, "payload")
+        with self.assertLogs(level="WARNING"):
+            await main.send_messages(1, websocket, queue)
+        self.assertNotIn(1, main.subscriptions)
+
+
+if __name__ == "__main__":
+    unittest.main()